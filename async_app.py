@@ -0,0 +1,775 @@
+# Async (ASGI) serving mode for the e-commerce API
+#
+# pip install quart hypercorn aiomysql
+# pip install aiosqlite   (only needed when DATABASE_URL points at a sqlite file)
+#
+#   hypercorn async_app:app --bind 127.0.0.1:8000 --workers 4
+#
+# application.py stays the WSGI app (flask run / gunicorn). This module serves every route of it
+# with Quart (the async version of the Flask API) on an async SQLAlchemy engine. While a request
+# waits on the database the worker's event loop keeps serving other requests, instead of tying up
+# one thread per in-flight request.
+#
+# Models, schemas and the order logic come from application.py. Code that was written for a sync
+# Session (place_order, change_order, keyset_page, order_totals, reserve, restock, ...) runs through
+# AsyncSession.run_sync, which drives the same ORM code with the async driver underneath, so both
+# modes behave the same. Batch work that opens its own sessions on application's engine (bulk
+# inserts, the CSV import, building the search index) runs in a worker thread, see in_sync_app().
+#
+# DATABASE_URL picks the database for both engines, the async one gets the driver swapped
+# (mysql+mysqldb -> mysql+aiomysql, sqlite -> sqlite+aiosqlite). ASYNC_DATABASE_URL can pick
+# another async driver but has to point at the same database, otherwise the app won't start.
+# The DB_POOL_* settings apply to both pools. application's pool only opens connections for the
+# batch work and background jobs (one per job while it runs), the requests use the async pool.
+
+import asyncio
+import datetime
+import io
+import os
+import tempfile
+import time
+import zlib
+
+from marshmallow import ValidationError
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from quart import Quart, Response, g, jsonify, request
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from application import (MAX_IDEMPOTENCY_KEY_LENGTH, REQUEST_LATENCY, REQUEST_SIZE, REQUESTS_IN_FLIGHT, RESERVATION_SWEEP_INTERVAL,
+                         RESPONSE_SIZE, STREAM_CHUNK_SIZE, Customer, CustomerAccount, Order, PoolMetrics, Product, TableVersion,
+                         account_schema, accounts_schema, app as sync_app, bulk_args_schema, bulk_insert, bump_table_version,
+                         catalog_cache, change_order, confirm_reservation, customer_schema, customer_search_schema, customers_schema,
+                         delete_order, duplicate_product_name, export_header, find_idempotency_key, format_export_rows,
+                         history_order_to_dict, idempotent_replay, import_products_csv, index_new_products, keyset_page,
+                         load_line_items, low_stock_page, low_stock_schema, new_order_schema, next_order_line_key, order_export_query,
+                         order_export_schema, order_history_page, order_history_schema, order_line_chunk, order_quantities,
+                         order_schema, order_to_dict, order_totals, order_totals_body, order_totals_schema, page_args_schema,
+                         place_order, product_availability, product_schema, product_search_body, product_search_index,
+                         product_search_schema, products_schema, release_reservation, request_fingerprint, reservation_confirm_schema,
+                         reservation_conflict, reservation_expiry, reservation_schema, reserve, restock, restock_job_counts,
+                         restock_schema, save_idempotency_key, search_customers_page, start_background_job, start_idempotency_purger,
+                         sweep_expired_reservations, utcnow)
+
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+def async_database_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(),url.drivername))
+
+# the database a URL points at, whatever the driver
+def database_identity(url):
+    url = make_url(url)
+    return url.get_backend_name(),url.host,url.port,url.database
+
+database_url = os.environ.get("ASYNC_DATABASE_URL") or async_database_url(sync_app.config["SQLALCHEMY_DATABASE_URI"])
+
+# the batch work and background jobs run on application's engine, so an ASYNC_DATABASE_URL that points
+# somewhere else would split the writes across two databases
+if database_identity(database_url) != database_identity(sync_app.config["SQLALCHEMY_DATABASE_URI"]):
+    raise RuntimeError(
+        "ASYNC_DATABASE_URL and DATABASE_URL point at different databases. async_app uses both engines, "
+        "set DATABASE_URL and leave ASYNC_DATABASE_URL unset, or only change its driver"
+    )
+
+engine_options = {}
+if make_url(database_url).get_backend_name() != "sqlite":
+    engine_options = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE",10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW",20)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT",30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE",1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING","1") == "1",
+    }
+
+engine = create_async_engine(database_url,**engine_options)
+# objects stay readable after commit, the handlers serialize them once the session is closed
+AsyncSession = async_sessionmaker(engine,expire_on_commit=False)
+
+# counters for this engine's pool at GET /metrics/pool. Checkout waits are only timed by
+# application's MeteredQueuePool, so the wait_seconds fields stay 0 here
+pool_metrics = PoolMetrics()
+pool_metrics.listen(engine.sync_engine)
+
+# same as application: sqlite only uses an index for LIKE 'term%' when LIKE is case sensitive
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine,"connect")
+    def sqlite_case_sensitive_like(dbapi_connection,connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA case_sensitive_like = ON")
+        cursor.close()
+
+app = Quart(__name__)
+
+# expires the holds other processes (or the last run) left behind, like application's first request does
+@app.before_serving
+async def start_reservation_sweep():
+    start_background_job("reservation-sweep",RESERVATION_SWEEP_INTERVAL,sweep_expired_reservations)
+
+@app.after_serving
+async def dispose_engine():
+    await engine.dispose()
+
+############################### helpers ###################
+
+async def keyset_page_async(session,model,key_column,after,limit,*options):
+    return await session.run_sync(lambda sync_session: keyset_page(model,key_column,after,limit,*options,session=sync_session))
+
+# for the batch jobs that open their own sessions on application's engine: runs them in a worker
+# thread inside application's app context, so the event loop keeps serving while they work
+async def in_sync_app(function,*args):
+    def run():
+        with sync_app.app_context():
+            return function(*args)
+    return await asyncio.to_thread(run)
+
+async def table_version(session,table_name):
+    return (await session.execute(select(TableVersion.version).where(TableVersion.table_name == table_name))).scalar()
+
+# same ETags as application.table_etag, so a client can switch between the two deployments
+def table_etag(table_name,version):
+    return f"{table_name}-{version}-{zlib.crc32(request.full_path.encode()):08x}"
+
+def not_modified(etag):
+    if request.if_none_match.contains(etag):
+        response = Response("",status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def json_response(body,status=200):
+    return Response(body,status=status,mimetype="application/json")
+
+def wants_stream():
+    return request.args.get("stream") == "1" or request.accept_mimetypes.best == "application/x-ndjson"
+
+# same output as application.stream_ndjson, each chunk of STREAM_CHUNK_SIZE rows is read in its
+# own session so only one chunk is held in memory at a time
+def stream_ndjson(model,key_column,after,to_dict,*options):
+    async def generate():
+        last_key = after
+        while True:
+            async with AsyncSession() as session:
+                rows,next_cursor = await keyset_page_async(session,model,key_column,last_key,STREAM_CHUNK_SIZE,*options)
+                chunk = "".join(app.json.dumps(to_dict(row)) + "\n" for row in rows)
+            if chunk:
+                yield chunk
+            if next_cursor is None:
+                break
+            last_key = next_cursor
+
+    return Response(generate(),mimetype="application/x-ndjson")
+
+async def find_idempotency_key_async(key):
+    async with AsyncSession() as session:
+        return await session.run_sync(find_idempotency_key,key)
+
+def idempotent_replay_response(record,request_hash):
+    response = json_response(*idempotent_replay(record,request_hash))
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+############################### customers ###################
+
+@app.route("/customers",methods=["GET"])
+async def get_customers():
+    try:
+        page_args = page_args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    if wants_stream():
+        return stream_ndjson(Customer,Customer.customer_id,page_args['after'],customer_schema.dump)
+
+    async with AsyncSession() as session:
+        etag = table_etag("Customers",await table_version(session,"Customers"))
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        customers,next_cursor = await keyset_page_async(session,Customer,Customer.customer_id,page_args['after'],page_args['limit'])
+
+    response = jsonify({"customers": customers_schema.dump(customers),"next_cursor": next_cursor})
+    response.set_etag(etag)
+    return response
+
+@app.route("/customers/search",methods=["GET"])
+async def search_customers():
+    try:
+        search_args = customer_search_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        customers,next_cursor = await session.run_sync(search_customers_page,search_args)
+    return jsonify({"customers": customers_schema.dump(customers),"next_cursor": next_cursor})
+
+@app.route("/customers",methods=["POST"])
+async def add_customers():
+    try:
+        customer_data = customer_schema.load(await request.get_json())
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        async with session.begin():
+            session.add(Customer(name=customer_data['name'],email=customer_data['email'],phone=customer_data['phone']))
+            await session.run_sync(bump_table_version,"Customers")
+    return jsonify({"Message":"New Customer Added successfully!!"})
+
+@app.route("/customers/bulk",methods=["POST"])
+async def add_customers_bulk():
+    try:
+        bulk_args = bulk_args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    rows = await request.get_json()
+    if not isinstance(rows,list):
+        return jsonify({"message":"Send a JSON array of records"}),400
+
+    body,status = await in_sync_app(bulk_insert,Customer,customer_schema,("name","email","phone"),"Customers",rows,bulk_args['chunk_size'])
+    return jsonify(body),status
+
+# the two PUT /customers routes only differ in how they find the customer
+async def update_customer(condition):
+    async with AsyncSession() as session:
+        async with session.begin():
+            customer = (await session.execute(select(Customer).where(condition))).scalars().first()
+            if customer is None:
+                return jsonify({"message":"Customer not found"}),404
+
+            try:
+                customer_data = customer_schema.load(await request.get_json())
+            except ValidationError as err:
+                return jsonify(err.messages),400
+
+            for field,value in customer_data.items():
+                setattr(customer,field,value)
+            await session.run_sync(bump_table_version,"Customers")
+
+    return jsonify({"Message": "Customer Info Updated Successfully!!"})
+
+@app.route("/customers/<int:id>",methods=["PUT"])
+async def update_customers(id):
+    return await update_customer(Customer.customer_id == id)
+
+@app.route("/customers/by_name/<string:name_val>",methods=["PUT"])
+async def update_customers_by_name(name_val):
+    return await update_customer(Customer.name == name_val)
+
+@app.route("/customers/<int:cust_id>",methods=["DELETE"])
+async def delete_customers(cust_id):
+    async with AsyncSession() as session:
+        async with session.begin():
+            customer = await session.get(Customer,cust_id)
+            if customer is None:
+                return jsonify({"message":"Customer not found"}),404
+            await session.delete(customer)
+            await session.run_sync(bump_table_version,"Customers")
+    return jsonify({"message":"Customer removed successfully!!"})
+
+############################### customer accounts ###################
+
+@app.route("/customeraccount",methods=["GET"])
+async def get_customer_account():
+    async with AsyncSession() as session:
+        accounts = (await session.execute(select(CustomerAccount))).scalars().all()
+    return jsonify(accounts_schema.dump(accounts))
+
+@app.route("/customeraccount",methods=["POST"])
+async def add_customer_account():
+    try:
+        account_data = account_schema.load(await request.get_json())
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        async with session.begin():
+            session.add(CustomerAccount(username=account_data['username'],password=account_data['password'],customer_id=account_data['customer_id']))
+    return jsonify({"message": "New Customer Account added"})
+
+@app.route("/customeraccount/<int:accid>",methods=["PUT"])
+async def update_customer_account(accid):
+    async with AsyncSession() as session:
+        async with session.begin():
+            account = await session.get(CustomerAccount,accid)
+            if account is None:
+                return jsonify({"message":"CustomerAccount not found"}),404
+
+            try:
+                account_data = account_schema.load(await request.get_json())
+            except ValidationError as err:
+                return jsonify(err.messages),400
+
+            for field,value in account_data.items():
+                setattr(account,field,value)
+
+    return jsonify({"message":"Customer Account details updated successfully"}),200
+
+@app.route("/customeraccount/<int:acc_id>",methods=["DELETE"])
+async def delete_customer_account(acc_id):
+    async with AsyncSession() as session:
+        async with session.begin():
+            account = await session.get(CustomerAccount,acc_id)
+            if account is None:
+                return jsonify({"message":"Customer Account not found"}),404
+            await session.delete(account)
+    return jsonify({"message":"Customer Account deleted successfully"})
+
+############################### orders ###################
+
+@app.route("/orders",methods=["GET"])
+async def get_orders():
+    try:
+        page_args = page_args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    if wants_stream():
+        return stream_ndjson(Order,Order.order_id,page_args['after'],order_to_dict,load_line_items)
+
+    async with AsyncSession() as session:
+        orders,next_cursor = await keyset_page_async(session,Order,Order.order_id,page_args['after'],page_args['limit'],load_line_items)
+
+    return jsonify({"orders": [order_to_dict(order) for order in orders],"next_cursor": next_cursor})
+
+@app.route("/orders",methods=["POST"])
+async def add_orders():
+    data = await request.get_json()
+    try:
+        order_data = new_order_schema.load(data)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    # same Idempotency-Key handling as application.add_orders
+    key = request.headers.get("Idempotency-Key")
+    if key is not None:
+        if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({"Error": f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"}),400
+        request_hash = request_fingerprint(data)
+        record = await find_idempotency_key_async(key)
+        if record is not None:
+            return idempotent_replay_response(record,request_hash)
+        start_idempotency_purger()
+
+    def place_order_once(session):
+        body,status = place_order(session,order_data)
+        if key is not None and status == 201:
+            save_idempotency_key(session,key,request_hash,body,status)
+        return body,status
+
+    try:
+        async with AsyncSession() as session:
+            async with session.begin():
+                body,status = await session.run_sync(place_order_once)
+    except IntegrityError:
+        if key is None:
+            raise
+        record = await find_idempotency_key_async(key)
+        if record is None:
+            raise
+        return idempotent_replay_response(record,request_hash)
+
+    if status == 201:
+        catalog_cache.invalidate(order_quantities(order_data))
+    return jsonify(body),status
+
+@app.route("/orders/history",methods=["GET"])
+async def get_orders_custid():
+    try:
+        history_args = order_history_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        orders,next_cursor = await session.run_sync(order_history_page,history_args)
+
+    return jsonify({"orders": [history_order_to_dict(order) for order in orders],"next_cursor": next_cursor}),200
+
+@app.route("/orders/<int:orderid>",methods=["PUT"])
+async def update_orders(orderid):
+    try:
+        order_data = order_schema.load(await request.get_json())
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        async with session.begin():
+            body,status,changed_product_ids = await session.run_sync(change_order,orderid,order_data)
+
+    catalog_cache.invalidate(changed_product_ids)
+    return jsonify(body),status
+
+@app.route("/orders/<int:order_id>/total",methods=["GET"])
+async def get_order_total(order_id):
+    async with AsyncSession() as session:
+        totals = await session.run_sync(lambda sync_session: order_totals(Order.order_id == order_id,session=sync_session))
+    if not totals:
+        return jsonify({"Error": f"Order with id {order_id} doesn't exist"}),404
+    return jsonify(totals[0]),200
+
+@app.route("/orders/totals",methods=["POST"])
+async def get_order_totals():
+    try:
+        totals_data = order_totals_schema.load(await request.get_json())
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        body,status = await session.run_sync(order_totals_body,totals_data)
+    return jsonify(body),status
+
+@app.route("/orders/export",methods=["GET"])
+async def export_orders():
+    try:
+        export_args = order_export_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    export_format = export_args['format']
+    query = order_export_query(export_args.get('date_from'),export_args.get('date_to'))
+
+    # the same keyset chunks as application.export_order_lines, each read in its own session
+    async def generate():
+        yield export_header(export_format)
+        after = None
+        while True:
+            async with AsyncSession() as session:
+                rows = await session.run_sync(order_line_chunk,query,after)
+            if rows:
+                yield format_export_rows(rows,export_format)
+            after = next_order_line_key(rows)
+            if after is None:
+                break
+
+    return Response(
+        generate(),
+        mimetype="text/csv" if export_format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=orders.{export_format}"}
+    )
+
+@app.route("/orders/<int:order_id>",methods=["DELETE"])
+async def cancel_order(order_id):
+    async with AsyncSession() as session:
+        async with session.begin():
+            body,status,changed_product_ids = await session.run_sync(delete_order,order_id)
+    catalog_cache.invalidate(changed_product_ids)
+    return jsonify(body),status
+
+############################### products ###################
+
+# uses the same in-process catalog cache as the sync routes, writes made through either app
+# in this process invalidate it, and entries read at an older Products version are skipped
+
+@app.route("/products",methods=["GET"])
+async def get_products():
+    try:
+        page_args = page_args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    if wants_stream():
+        return stream_ndjson(Product,Product.product_id,page_args['after'],product_schema.dump)
+
+    async with AsyncSession() as session:
+        version = await table_version(session,"Products")
+        etag = table_etag("Products",version)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        key = ("page",page_args['after'],page_args['limit'])
+        body = catalog_cache.get(key,version)
+        if body is None:
+            generation = catalog_cache.generation
+            products,next_cursor = await keyset_page_async(session,Product,Product.product_id,page_args['after'],page_args['limit'])
+            body = app.json.dumps({"products": products_schema.dump(products),"next_cursor": next_cursor})
+            catalog_cache.put(key,body,version,generation,page_range=(page_args['after'],next_cursor))
+
+    response = json_response(body)
+    response.set_etag(etag)
+    return response
+
+@app.route("/products/<int:product_id>",methods=["GET"])
+async def get_product(product_id):
+    async with AsyncSession() as session:
+        version = await table_version(session,"Products")
+        etag = table_etag("Products",version)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        key = ("product",product_id)
+        body = catalog_cache.get(key,version)
+        if body is None:
+            generation = catalog_cache.generation
+            product = await session.get(Product,product_id)
+            if product is None:
+                return jsonify({"error": "Product not found"}),404
+            body = app.json.dumps(product_schema.dump(product))
+            catalog_cache.put(key,body,version,generation)
+
+    response = json_response(body)
+    response.set_etag(etag)
+    return response
+
+# the first search builds the index from the database, so it runs off the event loop
+@app.route("/products/search",methods=["GET"])
+async def search_products():
+    try:
+        search_args = product_search_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    return jsonify(await in_sync_app(product_search_body,search_args))
+
+@app.route("/products/low_stock",methods=["GET"])
+async def get_low_stock_products():
+    try:
+        low_stock_args = low_stock_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        products,next_cursor = await session.run_sync(low_stock_page,low_stock_args)
+    return jsonify({"products": products_schema.dump(products),"next_cursor": next_cursor})
+
+@app.route("/products/restock",methods=["POST"])
+async def restock_products():
+    try:
+        restock_data = restock_schema.load(await request.get_json())
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    quantities = order_quantities(restock_data)
+    async with AsyncSession() as session:
+        async with session.begin():
+            body,status = await session.run_sync(restock,quantities)
+
+    if status == 200:
+        catalog_cache.invalidate(quantities)
+    return jsonify(body),status
+
+@app.route("/products/restock/jobs",methods=["GET"])
+async def get_restock_jobs():
+    async with AsyncSession() as session:
+        return jsonify(await session.run_sync(restock_job_counts))
+
+@app.route("/products/<int:product_id>/available",methods=["GET"])
+async def get_product_available(product_id):
+    async with AsyncSession() as session:
+        availability = await session.run_sync(product_availability,product_id)
+    if availability is None:
+        return jsonify({"error": "Product not found"}),404
+    return jsonify(availability)
+
+@app.route("/products/cache",methods=["GET"])
+async def get_catalog_cache_stats():
+    return jsonify(catalog_cache.stats())
+
+@app.route("/products",methods=["POST"])
+async def add_products():
+    try:
+        product_data = product_schema.load(await request.get_json())
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    new_product = Product(name=product_data['name'],price=product_data['price'],stock_level=product_data['stock_level'],
+                          reorder_level=product_data.get('reorder_level'))
+    try:
+        async with AsyncSession() as session:
+            async with session.begin():
+                session.add(new_product)
+                await session.run_sync(bump_table_version,"Products")
+    except IntegrityError:
+        return jsonify(duplicate_product_name(product_data['name'])),409
+
+    catalog_cache.invalidate([new_product.product_id])
+    product_search_index.add(new_product.product_id,new_product.name,new_product.price)
+    return jsonify({"Message":"New Product added successfully"})
+
+def add_products_in_bulk(rows,chunk_size):
+    response = bulk_insert(Product,product_schema,("name","price","stock_level","reorder_level"),"Products",rows,chunk_size)
+    catalog_cache.invalidate_last_pages()
+    index_new_products()
+    return response
+
+@app.route("/products/bulk",methods=["POST"])
+async def add_products_bulk():
+    try:
+        bulk_args = bulk_args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    rows = await request.get_json()
+    if not isinstance(rows,list):
+        return jsonify({"message":"Send a JSON array of records"}),400
+
+    body,status = await in_sync_app(add_products_in_bulk,rows,bulk_args['chunk_size'])
+    return jsonify(body),status
+
+# a text/csv body is spooled here as it arrives (to disk past this many bytes), so the import
+# reads it like an uploaded file without holding a big catalog in memory
+IMPORT_SPOOL_SIZE = 1024 * 1024
+
+def import_products_file(raw_file,chunk_size):
+    def progress(summary):
+        sync_app.logger.info("product import: %s rows read, %s inserted, %s updated, %s invalid",summary["rows"],summary["inserted"],summary["updated"],summary["invalid"])
+
+    csv_file = io.TextIOWrapper(raw_file,encoding="utf-8",newline="")
+    try:
+        return import_products_csv(csv_file,chunk_size,progress)
+    finally:
+        csv_file.detach() # the route closes raw_file
+
+@app.route("/products/import",methods=["POST"])
+async def import_products():
+    try:
+        bulk_args = bulk_args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    files = await request.files
+    if "file" in files:
+        raw_file = files["file"].stream
+    elif request.mimetype == "text/csv":
+        raw_file = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE)
+        async for data in request.body:
+            raw_file.write(data)
+        raw_file.seek(0)
+    else:
+        return jsonify({"message":"Upload the CSV as form field 'file' or send it with Content-Type: text/csv"}),400
+
+    try:
+        summary = await in_sync_app(import_products_file,raw_file,bulk_args['chunk_size'])
+    except UnicodeDecodeError:
+        return jsonify({"message":"The CSV file has to be UTF-8"}),400
+    finally:
+        raw_file.close()
+    return jsonify(summary),200
+
+@app.route("/products/<int:product_id>",methods=["PUT"])
+async def update_product(product_id):
+    try:
+        async with AsyncSession() as session:
+            async with session.begin():
+                product = await session.get(Product,product_id)
+                if product is None:
+                    return jsonify({"error": "Product not found"}),404
+
+                try:
+                    product_data = product_schema.load(await request.get_json())
+                except ValidationError as err:
+                    return jsonify(err.messages),400
+
+                for field,value in product_data.items():
+                    setattr(product,field,value)
+                await session.run_sync(bump_table_version,"Products")
+    except IntegrityError:
+        return jsonify(duplicate_product_name(product_data['name'])),409
+
+    catalog_cache.invalidate([product_id])
+    product_search_index.add(product_id,product_data['name'],product_data['price'])
+    return jsonify({"Message":f"Product with id {product_id} updated successfully"}),200
+
+@app.route("/products/<int:product_id>",methods=["DELETE"])
+async def delete_products(product_id):
+    async with AsyncSession() as session:
+        async with session.begin():
+            product = await session.get(Product,product_id)
+            if product is None:
+                return jsonify({"message":"Product not found"}),404
+            product_name,stock_level = product.name,product.stock_level
+            await session.delete(product)
+            await session.run_sync(bump_table_version,"Products")
+
+    catalog_cache.invalidate([product_id])
+    product_search_index.remove(product_id)
+    return jsonify({"message":f"Product with id {product_id} and name {product_name} and stock-level {stock_level} deleted successfully"})
+
+############################### reservations ###################
+
+@app.route("/reservations",methods=["POST"])
+async def add_reservation():
+    try:
+        reservation_data = reservation_schema.load(await request.get_json())
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        async with session.begin():
+            body,status = await session.run_sync(reserve,reservation_data)
+
+    if status == 201:
+        reservation_expiry.add(utcnow() + datetime.timedelta(seconds=reservation_data['ttl_seconds']),body["reservation_id"])
+    return jsonify(body),status
+
+@app.route("/reservations/<int:reservation_id>/confirm",methods=["POST"])
+async def confirm_reservation_route(reservation_id):
+    try:
+        confirm_data = reservation_confirm_schema.load(await request.get_json(silent=True) or {})
+    except ValidationError as err:
+        return jsonify(err.messages),400
+
+    async with AsyncSession() as session:
+        async with session.begin():
+            body,status,changed_product_ids = await session.run_sync(confirm_reservation,reservation_id,confirm_data['date'])
+
+    catalog_cache.invalidate(changed_product_ids)
+    return jsonify(body),status
+
+@app.route("/reservations/<int:reservation_id>",methods=["DELETE"])
+async def delete_reservation(reservation_id):
+    async with AsyncSession() as session:
+        async with session.begin():
+            if not await session.run_sync(release_reservation,reservation_id):
+                body,status = await session.run_sync(reservation_conflict,reservation_id)
+                return jsonify(body),status
+    return jsonify({"Message": f"Reservation with id {reservation_id} released"}),200
+
+############################### metrics ###################
+
+# the same request metrics as application, so dashboards work against either deployment
+
+def metrics_endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+@app.before_request
+async def start_request_metrics():
+    g.request_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+async def record_request_metrics(response):
+    if "request_start" in g:
+        endpoint = metrics_endpoint_label()
+        REQUEST_LATENCY.labels(request.method,endpoint,response.status_code).observe(time.perf_counter() - g.request_start)
+        REQUEST_SIZE.labels(request.method,endpoint).observe(request.content_length or 0)
+        if response.content_length is not None:
+            RESPONSE_SIZE.labels(request.method,endpoint,response.status_code).observe(response.content_length)
+    return response
+
+@app.teardown_request
+async def finish_request_metrics(exc):
+    if "request_start" in g:
+        REQUESTS_IN_FLIGHT.dec()
+
+@app.route("/metrics",methods=["GET"])
+async def get_metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # every worker writes its numbers to files in that directory, add them all up
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry),mimetype=CONTENT_TYPE_LATEST)
+
+@app.route("/metrics/pool",methods=["GET"])
+async def get_pool_metrics():
+    return jsonify(pool_metrics.snapshot(engine.sync_engine.pool))
+
+@app.route("/")
+async def home():
+    return "Welcome to our E-commerce API (async)"
@@ -0,0 +1,275 @@
+# Load test / benchmark for the e-commerce API
+#
+# Starts the app on a local port against its own database (a sqlite file by default), seeds it,
+# then runs a mix of catalog reads, order placement, order history and order updates from
+# several concurrent clients and prints p50/p95/p99 latency and throughput per route as JSON.
+#
+#   python benchmark.py --customers 2000 --products 500 --orders 5000 --clients 16 --duration 30 --output bench.json
+#
+# Run it on two commits with the same arguments and compare the JSON to catch regressions.
+# To benchmark a server that is already running (e.g. against MySQL) pass --url and --no-seed.
+# --server async runs async_app.py under hypercorn instead of the threaded WSGI server, run both
+# with the same arguments to compare the two serving modes.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+# route name -> how often it is picked, a rough picture of real traffic
+DEFAULT_MIX = {
+    "GET /products": 30,
+    "GET /products/<id>": 25,
+    "GET /customers": 5,
+    "POST /orders": 15,
+    "GET /orders/history": 15,
+    "PUT /orders/<id>": 5,
+    "GET /orders/<id>/total": 5,
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the e-commerce API")
+    parser.add_argument("--database-url",help="database to run against, a new sqlite file by default")
+    parser.add_argument("--url",help="benchmark an already running server instead of starting one")
+    parser.add_argument("--server",choices=["sync","async"],default="sync",help="serve application.py (WSGI) or async_app.py (ASGI)")
+    parser.add_argument("--no-seed",action="store_true",help="don't add data, use what is in the database")
+    parser.add_argument("--customers",type=int,default=1000)
+    parser.add_argument("--products",type=int,default=200)
+    parser.add_argument("--orders",type=int,default=2000)
+    parser.add_argument("--clients",type=int,default=8,help="number of concurrent clients")
+    parser.add_argument("--duration",type=float,default=10,help="seconds to run the load for")
+    parser.add_argument("--warmup",type=float,default=2,help="seconds of load before measuring")
+    parser.add_argument("--mix",type=json.loads,default=DEFAULT_MIX,help="JSON object of route name -> weight")
+    parser.add_argument("--seed",type=int,default=42,help="random seed for data and request choices")
+    parser.add_argument("--output",help="also write the JSON report to this file")
+    return parser.parse_args()
+
+# ---------------- setup ----------------
+
+# fills an empty database with the synthetic data generator. Products get plenty of stock so
+# order placement keeps succeeding for the whole run
+def seed_database(application,customers,products,orders,seed):
+    with application.app.app_context():
+        application.generate_data(customers,products,orders,seed=seed,stock_level=10**9)
+
+# runs the app with werkzeug's threaded server on a free local port, returns its base url
+def start_server(application):
+    from werkzeug.serving import WSGIRequestHandler,make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1" # so each client reuses its connection
+
+        def log_request(self,*args,**kwargs):
+            pass
+
+    server = make_server("127.0.0.1",0,application.app,threaded=True,request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}",server
+
+class AsyncServer:
+    def __init__(self,asgi_app,port):
+        import asyncio
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f"127.0.0.1:{port}"]
+        config.accesslog = None
+        config.errorlog = None
+        self.loop = asyncio.new_event_loop()
+        self.stopped = asyncio.Event()
+        self.thread = threading.Thread(target=self.loop.run_until_complete,args=(serve(asgi_app,config,shutdown_trigger=self.stopped.wait),),daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.stopped.set)
+        self.thread.join()
+
+# runs async_app with hypercorn on its own event loop thread, returns its base url once it accepts connections
+def start_async_server():
+    import async_app
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1",0))
+        port = probe.getsockname()[1]
+    server = AsyncServer(async_app.app,port)
+    deadline = time.perf_counter() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1",port),timeout=1).close()
+            break
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}",server
+
+# ---------------- load ----------------
+
+class Client:
+    def __init__(self,base_url,rng,args):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.connection = http.client.HTTPConnection(self.host,self.port,timeout=60)
+        self.rng = rng
+        self.args = args
+
+    def request(self,method,path,body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        data = json.dumps(body) if body is not None else None
+        try:
+            self.connection.request(method,path,body=data,headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException,OSError):
+            # the server closed the connection, open a new one for the next request
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host,self.port,timeout=60)
+            return 0
+
+    def order_lines(self):
+        product_ids = self.rng.sample(range(1,self.args.products + 1),min(self.args.products,self.rng.randint(1,4)))
+        return [{"product_id": product_id,"quantity": self.rng.randint(1,3)} for product_id in product_ids]
+
+    # sends one request for the given route name and returns its status code
+    def run(self,route):
+        rng = self.rng
+        if route == "GET /products":
+            return self.request("GET",f"/products?after={rng.randint(0,max(0,self.args.products - 50))}&limit=50")
+        if route == "GET /products/<id>":
+            return self.request("GET",f"/products/{rng.randint(1,self.args.products)}")
+        if route == "GET /customers":
+            return self.request("GET",f"/customers?after={rng.randint(0,max(0,self.args.customers - 50))}&limit=50")
+        if route == "POST /orders":
+            return self.request("POST","/orders",{"date": "2024-07-01","customer_id": rng.randint(1,self.args.customers),"products": self.order_lines()})
+        if route == "GET /orders/history":
+            return self.request("GET",f"/orders/history?customer_id={rng.randint(1,self.args.customers)}")
+        if route == "PUT /orders/<id>":
+            return self.request("PUT",f"/orders/{rng.randint(1,self.args.orders)}",{"date": "2024-07-02","customer_id": rng.randint(1,self.args.customers),"products": self.order_lines()})
+        if route == "GET /orders/<id>/total":
+            return self.request("GET",f"/orders/{rng.randint(1,self.args.orders)}/total")
+        raise ValueError(f"unknown route {route}")
+
+# each client picks routes by weight until the time is up and records (route, status, seconds)
+def run_load(base_url,args):
+    routes = list(args.mix)
+    weights = [args.mix[route] for route in routes]
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + args.warmup
+    stop_at = measure_from + args.duration
+
+    def client_loop(client_number):
+        client = Client(base_url,random.Random(args.seed * 1000 + client_number),args)
+        local_samples = defaultdict(list)
+        local_errors = defaultdict(int)
+        while True:
+            route = client.rng.choices(routes,weights)[0]
+            start = time.perf_counter()
+            if start >= stop_at:
+                break
+            status = client.run(route)
+            elapsed = time.perf_counter() - start
+            if start >= measure_from:
+                local_samples[route].append(elapsed)
+                if status == 0 or status >= 500:
+                    local_errors[route] += 1
+        with lock:
+            for route,values in local_samples.items():
+                samples[route].extend(values)
+            for route,count in local_errors.items():
+                errors[route] += count
+
+    threads = [threading.Thread(target=client_loop,args=(number,)) for number in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples,errors
+
+# ---------------- report ----------------
+
+def percentile(sorted_values,fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1,max(0,round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(values,errors,duration):
+    values = sorted(values)
+    milliseconds = lambda seconds: round(seconds * 1000,3) if seconds is not None else None
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / duration,1),
+        "mean_ms": milliseconds(sum(values) / len(values)) if values else None,
+        "p50_ms": milliseconds(percentile(values,0.50)),
+        "p95_ms": milliseconds(percentile(values,0.95)),
+        "p99_ms": milliseconds(percentile(values,0.99)),
+        "max_ms": milliseconds(values[-1]) if values else None,
+    }
+
+def build_report(samples,errors,args,database_url):
+    all_values = [value for values in samples.values() for value in values]
+    return {
+        "config": {
+            "database_url": database_url,
+            "server": None if args.url else args.server,
+            "customers": args.customers,
+            "products": args.products,
+            "orders": args.orders,
+            "clients": args.clients,
+            "duration_seconds": args.duration,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "routes": {route: summarize(samples[route],errors[route],args.duration) for route in sorted(samples)},
+        "total": summarize(all_values,sum(errors.values()),args.duration),
+    }
+
+def main():
+    args = parse_args()
+    database_url = args.database_url
+    server = None
+
+    if args.url:
+        base_url = args.url
+    else:
+        if database_url is None:
+            path = os.path.join(tempfile.mkdtemp(prefix="ecommerce-bench-"),"bench.db")
+            database_url = f"sqlite:///{path}?timeout=30"
+        os.environ["DATABASE_URL"] = database_url # has to be set before the app is imported
+        import application
+
+        if not args.no_seed:
+            started = time.perf_counter()
+            seed_database(application,args.customers,args.products,args.orders,args.seed)
+            print(f"seeded in {time.perf_counter() - started:.1f}s",flush=True)
+        if args.server == "async":
+            base_url,server = start_async_server()
+        else:
+            base_url,server = start_server(application)
+
+    samples,errors = run_load(base_url,args)
+    if server is not None:
+        server.shutdown()
+
+    report = build_report(samples,errors,args,database_url)
+    output = json.dumps(report,indent=2)
+    print(output)
+    if args.output:
+        with open(args.output,"w") as report_file:
+            report_file.write(output)
+
+if __name__ == "__main__":
+    main()
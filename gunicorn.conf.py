@@ -0,0 +1,30 @@
+# gunicorn settings for application.py
+#
+#   pip install gunicorn
+#   PROMETHEUS_MULTIPROC_DIR=/tmp/ecommerce-metrics gunicorn -c gunicorn.conf.py application:app
+#
+# With PROMETHEUS_MULTIPROC_DIR set every worker writes its metrics to files in that directory and
+# /metrics adds them all up. The hooks below keep the directory in step with the workers that are
+# actually running.
+
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get("GUNICORN_BIND","127.0.0.1:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS",4))
+
+# files left over from the last run would be added to this run's numbers
+def on_starting(server):
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory,exist_ok=True)
+        for path in glob.glob(os.path.join(directory,"*.db")):
+            os.remove(path)
+
+# a worker that died or was recycled (max_requests, timeout) still has its files in the directory,
+# so its requests_in_flight would be counted forever. This drops its live gauges
+def child_exit(server,worker):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
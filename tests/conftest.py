@@ -0,0 +1,33 @@
+# application.py reads its config and creates the tables when it is imported, so the database
+# has to be chosen before any test imports it. Tests run against a new sqlite file unless
+# TEST_DATABASE_URL points somewhere else (never at a database you care about, every test empties it).
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+test_database = os.path.join(tempfile.mkdtemp(prefix="ecommerce-tests-"),"test.db")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL",f"sqlite:///{test_database}?timeout=30")
+
+import application  # noqa: E402
+
+@pytest.fixture
+def app():
+    # every test starts with empty tables and empty in-process caches
+    with application.app.app_context():
+        application.db.session.remove()
+        with application.db.engine.begin() as connection:
+            for table in reversed(application.Base.metadata.sorted_tables):
+                if table.name != application.TableVersion.__tablename__:
+                    connection.execute(table.delete())
+    application.catalog_cache.clear()
+    application.product_search_index = application.ProductSearchIndex()
+    yield application
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
@@ -0,0 +1,51 @@
+from sqlalchemy import func, select
+
+def product_names(app):
+    with app.app.app_context():
+        return sorted(app.db.session.execute(select(app.Product.name)).scalars())
+
+# a value longer than its column is caught by the schema, on MySQL strict mode it would fail the
+# whole chunk's INSERT
+def test_too_long_values_are_invalid_rows(app,client):
+    rows = [
+        {"name": "Ann","email": "ann@example.com","phone": "555"},
+        {"name": "Bob","email": "bob@example.com","phone": "5" * 21},
+        {"name": "x" * 256,"email": "cat@example.com","phone": "555"}
+    ]
+    response = client.post("/customers/bulk?chunk_size=10",json=rows)
+    assert response.status_code == 207
+    assert response.json["inserted"] == 1
+    assert sorted(response.json["errors"]) == ["1","2"]
+    assert "phone" in response.json["errors"]["1"] and "name" in response.json["errors"]["2"]
+    with app.app.app_context():
+        assert app.db.session.execute(select(func.count()).select_from(app.Customer)).scalar() == 1
+
+# the database refuses one row of a chunk: the chunk is retried a row at a time, the other rows are
+# still inserted and the refused one is reported by its index in the request
+def test_refused_row_does_not_cost_its_chunk(app,client):
+    assert client.post("/products",json={"name": "widget","price": 2.5,"stock_level": 10}).status_code == 200
+    rows = [
+        {"name": "gadget","price": 1.0,"stock_level": 1},
+        {"name": "no price","stock_level": 1},
+        {"name": "lamp","price": 1.0,"stock_level": 1},
+        {"name": "widget","price": 1.0,"stock_level": 1}, # the name is taken
+        {"name": "mug","price": 1.0,"stock_level": 1}
+    ]
+    response = client.post("/products/bulk?chunk_size=10",json=rows)
+    assert response.status_code == 207
+    assert response.json["inserted"] == 3
+    assert list(response.json["errors"]) == ["1"]
+    assert list(response.json["failed_rows"]) == ["3"]
+    assert product_names(app) == ["gadget","lamp","mug","widget"]
+
+def test_each_row_is_loaded_once(app,client,monkeypatch):
+    loads = []
+    load = app.ProductSchema.load
+    def counting_load(self,data,**kwargs):
+        loads.append(data)
+        return load(self,data,**kwargs)
+    monkeypatch.setattr(app.ProductSchema,"load",counting_load)
+
+    rows = [{"name": f"product {number}","price": 1.0,"stock_level": 1} for number in range(5)] + [{"name": "bad"}]
+    assert client.post("/products/bulk",json=rows).status_code == 207
+    assert len(loads) == len(rows)
@@ -0,0 +1,64 @@
+from sqlalchemy import insert, update
+
+# a write made by another worker process never reaches this process's catalog_cache.invalidate(),
+# only the Products version in the database moves. The cached body must not outlive that version.
+def test_cached_product_is_reread_after_another_process_writes(app,client):
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Product),[{"product_id": 1,"name": "widget","price": 2.5,"stock_level": 10}])
+        app.db.session.commit()
+
+    first = client.get("/products/1")
+    assert first.json["price"] == 2.5
+    assert client.get("/products/1").json["price"] == 2.5 # served from the cache
+
+    # what another process's write looks like from here: the row and the version move, and neither
+    # a local invalidation nor a version noted by this process's own commit comes with them
+    with app.app.app_context():
+        app.db.session.execute(update(app.Product).where(app.Product.product_id == 1).values(price=4.0))
+        app.db.session.execute(update(app.TableVersion).where(app.TableVersion.table_name == "Products")
+                               .values(version=app.TableVersion.version + 1))
+        app.db.session.commit()
+
+    second = client.get("/products/1")
+    assert second.json["price"] == 4.0
+    assert second.headers["ETag"] != first.headers["ETag"]
+    page = client.get("/products?limit=10")
+    assert page.json["products"][0]["price"] == 4.0
+
+def seed(app,count):
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Customer),[{"customer_id": 1,"name": "Ann","email": "ann@example.com","phone": "555"}])
+        app.db.session.execute(insert(app.Product),[
+            {"product_id": product_id,"name": f"product {product_id}","price": 2.5,"stock_level": 1000}
+            for product_id in range(1,count + 1)
+        ])
+        app.db.session.commit()
+
+def order(client,product_id):
+    return client.post("/orders",json={"date": "2024-01-01","customer_id": 1,"products": [{"product_id": product_id,"quantity": 1}]})
+
+# an order here moves the Products version too, but it is this process's own write and already
+# invalidated precisely: only the ordered product and the page holding it are read again
+def test_order_drops_only_the_ordered_product(app,client):
+    seed(app,30)
+    for path in ["/products/1","/products/2","/products?limit=10","/products?limit=10&after=10"]:
+        client.get(path)
+
+    assert order(client,15).status_code == 201
+    before = app.catalog_cache.stats()
+    client.get("/products/1")
+    client.get("/products/2")
+    client.get("/products?limit=10")
+    assert client.get("/products?limit=10&after=10").json["products"][4]["stock_level"] == 999
+    after = app.catalog_cache.stats()
+    assert (after["hits"] - before["hits"],after["misses"] - before["misses"]) == (3,1)
+    assert after["version_resets"] == before["version_resets"]
+
+def test_hit_ratio_with_orders_in_the_mix(app,client):
+    seed(app,42)
+    for step in range(400):
+        if step % 7 == 0: # about 15% orders
+            order(client,step % 42 + 1)
+        else:
+            client.get(f"/products/{step * 5 % 42 + 1}")
+    assert client.get("/products/cache").json["hit_ratio"] > 0.6
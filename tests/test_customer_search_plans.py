@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import insert, text
+
+SEARCHES = [
+    ({"name": "Ann"},"ix_Customers_name"),
+    ({"email": "ann@"},"ix_Customers_email"),
+    ({"phone": "555"},"ix_Customers_phone"),
+]
+
+def query_plan(app,search_args):
+    query,sort_column = app.customer_search_query(search_args)
+    sql = query.limit(51).compile(app.db.engine,compile_kwargs={"literal_binds": True})
+    return " ".join(row[-1] for row in app.db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+# every search is a SEARCH (lookup or range) on its column's index, never a scan of the table or the whole index
+@pytest.mark.parametrize("match",["exact","prefix"])
+@pytest.mark.parametrize("after",[None,("Ann_Lee",5)])
+@pytest.mark.parametrize("fields,index",SEARCHES)
+def test_customer_search_uses_the_column_index(app,fields,index,match,after):
+    with app.app.app_context():
+        if app.db.engine.dialect.name != "sqlite":
+            pytest.skip("EXPLAIN QUERY PLAN is sqlite only")
+        plan = query_plan(app,{**fields,"match": match,"after": after})
+    assert f"SEARCH Customers USING INDEX {index}" in plan or f"SEARCH Customers USING COVERING INDEX {index}" in plan, plan
+
+def test_prefix_search_pages_by_name_then_id(app,client):
+    names = ["Ann_b","Ann_a","Anna","Ann_a","Bob","Annie"]
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Customer),[
+            {"customer_id": customer_id,"name": name,"email": f"c{customer_id}@example.com","phone": "555"}
+            for customer_id,name in enumerate(names,start=1)
+        ])
+        app.db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        response = client.get("/customers/search",query_string={"name": "Ann","match": "prefix","limit": 2,**({"after": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen += [(customer["name"],customer["customer_id"]) for customer in response.json["customers"]]
+        cursor = response.json["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [("Ann_a",2),("Ann_a",4),("Ann_b",1),("Anna",3),("Annie",6)]
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert
+
+REQUESTS = 20
+THREADS = 10
+
+ORDER = {"date": "2024-01-01","customer_id": 1,"products": [{"product_id": 1,"quantity": 2}]}
+
+def seed(app):
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Customer),[{"customer_id": 1,"name": "Ann","email": "ann@example.com","phone": "555"}])
+        app.db.session.execute(insert(app.Product),[{"product_id": 1,"name": "widget","price": 2.5,"stock_level": 100}])
+        app.db.session.commit()
+
+def post_order(client,key,order=ORDER):
+    return client.post("/orders",json=order,headers={"Idempotency-Key": key})
+
+def orders_and_stock(app):
+    with app.app.app_context():
+        return app.db.session.query(app.Order).count(),app.db.session.get(app.Product,1).stock_level
+
+def test_retry_with_the_same_key_replays_the_first_response(app,client):
+    seed(app)
+    first = post_order(client,"retry-1")
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    # same body with its keys in another order is the same request
+    second = post_order(client,"retry-1",dict(reversed(list(ORDER.items()))))
+    assert second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json == first.json
+    assert orders_and_stock(app) == (1,98)
+
+def test_same_key_with_another_body_is_422(app,client):
+    seed(app)
+    assert post_order(client,"changed-1").status_code == 201
+
+    changed = dict(ORDER,products=[{"product_id": 1,"quantity": 5}])
+    response = post_order(client,"changed-1",changed)
+    assert response.status_code == 422
+    assert orders_and_stock(app) == (1,98)
+
+# both requests looked the key up before either committed: the second fails on the key's primary
+# key, its order is rolled back with it and it answers with the first request's response
+def test_losing_a_race_on_the_key_replays_the_winner(app,client,monkeypatch):
+    seed(app)
+    winner = post_order(client,"race-1")
+    assert winner.status_code == 201
+
+    find = app.find_idempotency_key
+    lookups = []
+    def stale_first_lookup(session,key):
+        lookups.append(key)
+        return None if len(lookups) == 1 else find(session,key)
+    monkeypatch.setattr(app,"find_idempotency_key",stale_first_lookup)
+
+    loser = post_order(client,"race-1")
+    assert len(lookups) == 2 # the check before the order, and the one after the IntegrityError
+    assert loser.status_code == 201
+    assert loser.headers["Idempotent-Replayed"] == "true"
+    assert loser.json == winner.json
+    assert orders_and_stock(app) == (1,98)
+
+# sqlite runs one write at a time, so here most requests find the key already saved; with
+# TEST_DATABASE_URL on MySQL the IntegrityError path above is taken too
+def test_concurrent_requests_with_one_key_make_one_order(app):
+    seed(app)
+
+    def place_order(_):
+        # one test client per request, a client is not meant to be shared between threads
+        response = post_order(app.app.test_client(),"concurrent-1")
+        return response.status_code,response.json
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(place_order,range(REQUESTS)))
+
+    assert [status for status,body in results] == [201] * REQUESTS
+    assert all(body == results[0][1] for status,body in results)
+    assert orders_and_stock(app) == (1,98)
@@ -0,0 +1,45 @@
+from sqlalchemy import insert
+
+def seed(app):
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Customer),[
+            {"customer_id": 1,"name": "Ann","email": "ann@example.com","phone": "555"},
+            {"customer_id": 2,"name": "Bob","email": "bob@example.com","phone": "556"}
+        ])
+        app.db.session.execute(insert(app.Product),[{"product_id": 1,"name": "widget","price": 2.5,"stock_level": 10}])
+        app.db.session.commit()
+
+def stock_level(app):
+    with app.app.app_context():
+        return app.db.session.get(app.Product,1).stock_level
+
+# "products" is optional on PUT: leaving it out must not empty the order and give its stock back
+def test_update_without_products_keeps_the_line_items(app,client):
+    seed(app)
+    order_id = client.post("/orders",json={"date": "2024-01-01","customer_id": 1,"products": [{"product_id": 1,"quantity": 3}]}).json["order_id"]
+
+    response = client.put(f"/orders/{order_id}",json={"date": "2024-02-01","customer_id": 2})
+    assert response.status_code == 200
+    assert client.get(f"/orders/{order_id}/total").json["total"] == 7.5
+    assert stock_level(app) == 7
+    history = client.get("/orders/history?customer_id=2").json["orders"]
+    assert [order["order_id"] for order in history] == [order_id]
+
+def test_update_with_products_replaces_the_line_items(app,client):
+    seed(app)
+    order_id = client.post("/orders",json={"date": "2024-01-01","customer_id": 1,"products": [{"product_id": 1,"quantity": 3}]}).json["order_id"]
+
+    response = client.put(f"/orders/{order_id}",json={"date": "2024-01-01","customer_id": 1,"products": [{"product_id": 1,"quantity": 5}]})
+    assert response.status_code == 200
+    assert client.get(f"/orders/{order_id}/total").json["total"] == 12.5
+    assert stock_level(app) == 5
+
+def test_order_needs_products(app,client):
+    seed(app)
+    for body in ({"date": "2024-01-01","customer_id": 1},{"date": "2024-01-01","customer_id": 1,"products": []}):
+        assert client.post("/orders",json=body).status_code == 400
+    order_id = client.post("/orders",json={"date": "2024-01-01","customer_id": 1,"products": [{"product_id": 1,"quantity": 3}]}).json["order_id"]
+    assert client.put(f"/orders/{order_id}",json={"date": "2024-01-01","customer_id": 1,"products": []}).status_code == 400
+    with app.app.app_context():
+        assert app.db.session.query(app.Order).count() == 1
+    assert stock_level(app) == 7
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+IMPORTS = 8
+PRODUCTS = 50
+
+def catalog_csv(price):
+    rows = "".join(f"product {number},{price},{number}\n" for number in range(PRODUCTS))
+    return "name,price,stock_level\n" + rows
+
+def import_csv(client,body,chunk_size=10):
+    return client.post(f"/products/import?chunk_size={chunk_size}",data=body,headers={"Content-Type": "text/csv"})
+
+def products_by_name(app):
+    with app.app.app_context():
+        return app.db.session.execute(select(app.Product.name,func.count()).group_by(app.Product.name)).all()
+
+def test_reimport_updates_by_name(app,client):
+    first = import_csv(client,catalog_csv(1.5)).json
+    assert (first["inserted"],first["updated"]) == (PRODUCTS,0)
+
+    second = import_csv(client,catalog_csv(2.5)).json
+    assert (second["inserted"],second["updated"]) == (0,PRODUCTS)
+    assert len(products_by_name(app)) == PRODUCTS
+    with app.app.app_context():
+        assert set(app.db.session.execute(select(app.Product.price)).scalars()) == {2.5}
+
+# every import sees the names as new, the unique index and the upsert still keep one row per name.
+# sqlite runs one write at a time, the race only really happens with TEST_DATABASE_URL on MySQL
+def test_concurrent_imports_never_duplicate_a_name(app):
+    def run_import(number):
+        return import_csv(app.app.test_client(),catalog_csv(number)).status_code
+
+    with ThreadPoolExecutor(max_workers=IMPORTS) as pool:
+        statuses = list(pool.map(run_import,range(IMPORTS)))
+
+    assert statuses == [200] * IMPORTS
+    counts = products_by_name(app)
+    assert len(counts) == PRODUCTS
+    assert all(count == 1 for name,count in counts)
+
+def test_product_names_are_unique(app,client):
+    assert client.post("/products",json={"name": "widget","price": 2.5,"stock_level": 10}).status_code == 200
+    assert client.post("/products",json={"name": "gadget","price": 3.0,"stock_level": 10}).status_code == 200
+
+    response = client.post("/products",json={"name": "widget","price": 9.0,"stock_level": 1})
+    assert response.status_code == 409
+    with app.app.app_context():
+        gadget_id = app.db.session.execute(select(app.Product.product_id).where(app.Product.name == "gadget")).scalar()
+    response = client.put(f"/products/{gadget_id}",json={"name": "widget","price": 3.0,"stock_level": 10})
+    assert response.status_code == 409
+    assert sorted(name for name,count in products_by_name(app)) == ["gadget","widget"]
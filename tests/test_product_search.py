@@ -0,0 +1,49 @@
+from sqlalchemy import insert
+
+# the search index isn't built when application is imported, only by the first search
+def test_first_search_builds_the_index(app,client):
+    assert not app.product_search_index.built
+
+    response = client.post("/products",json={"name": "kitchen organizer","price": 12.5,"stock_level": 4})
+    assert response.status_code == 200
+    assert not app.product_search_index.built # nothing to update yet
+
+    response = client.get("/products/search?q=organizer")
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json["products"]] == ["kitchen organizer"]
+    assert app.product_search_index.built
+
+    # from now on writes update the index directly
+    client.post("/products",json={"name": "desk organizer","price": 8.0,"stock_level": 2})
+    response = client.get("/products/search?q=organizer")
+    assert response.json["total"] == 2
+
+def search_names(client,query):
+    return sorted(product["name"] for product in client.get(f"/products/search?q={query}").json["products"])
+
+# a rebuild reads the table and then replaces the index. Writes that land in between must not be
+# undone by the swap, or a deleted or renamed product is found again until the next rebuild
+def test_writes_during_a_rebuild_are_kept(app,client):
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Product),[
+            {"product_id": 1,"name": "kitchen organizer","price": 12.5,"stock_level": 4},
+            {"product_id": 2,"name": "desk organizer","price": 8.0,"stock_level": 2}
+        ])
+        app.db.session.commit()
+    assert search_names(client,"organizer") == ["desk organizer","kitchen organizer"]
+
+    with app.app.app_context():
+        with app.Session(app.db.engine) as session:
+            rows = list(session.execute(app.product_index_rows()))
+
+    def read_rows():
+        # the rows were read before these writes committed
+        assert client.delete(f"/products/1").status_code == 200
+        assert client.put(f"/products/2",json={"name": "desk lamp","price": 8.0,"stock_level": 2}).status_code == 200
+        assert client.post("/products",json={"name": "garden organizer","price": 3.0,"stock_level": 1}).status_code == 200
+        return rows
+    app.product_search_index.build(read_rows)
+
+    assert search_names(client,"organizer") == ["garden organizer"]
+    assert search_names(client,"lamp") == ["desk lamp"]
+    assert app.product_search_index.writes_during_build == []
@@ -0,0 +1,37 @@
+import datetime
+
+import pytest
+from sqlalchemy import insert
+
+ORDER_COUNTS = [1,200]
+
+# one customer with order_count orders of 3 line items each, written straight to the tables
+def seed_orders(app,order_count):
+    with app.app.app_context():
+        session = app.db.session
+        session.execute(insert(app.Customer),[{"customer_id": 1,"name": "Ann","email": "ann@example.com","phone": "555"}])
+        session.execute(insert(app.Product),[{"product_id": product_id,"name": f"product {product_id}","price": 2.5,"stock_level": 100} for product_id in range(1,4)])
+        session.execute(insert(app.Order),[{"order_id": order_id,"customer_id": 1,"date": datetime.date(2024,1,1)} for order_id in range(1,order_count + 1)])
+        session.execute(insert(app.OrderProduct),[
+            {"order_id": order_id,"product_id": product_id,"quantity": 1,"unit_price": 2.5}
+            for order_id in range(1,order_count + 1) for product_id in range(1,4)
+        ])
+        session.commit()
+
+@pytest.mark.parametrize("order_count",ORDER_COUNTS)
+def test_order_list_query_count_is_fixed(app,client,order_count):
+    seed_orders(app,order_count)
+    with app.query_budget(2):
+        response = client.get("/orders?limit=200")
+    assert response.status_code == 200
+    assert len(response.json["orders"]) == order_count
+    assert all(len(order["products"]) == 3 for order in response.json["orders"])
+
+@pytest.mark.parametrize("order_count",ORDER_COUNTS)
+def test_order_history_query_count_is_fixed(app,client,order_count):
+    seed_orders(app,order_count)
+    with app.query_budget(2):
+        response = client.get("/orders/history?customer_id=1&limit=200")
+    assert response.status_code == 200
+    assert len(response.json["orders"]) == order_count
+    assert all(len(order["products"]) == 3 for order in response.json["orders"])
@@ -0,0 +1,39 @@
+from sqlalchemy import insert
+
+def seed_product(app,stock_level):
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Customer),[{"customer_id": 1,"name": "Ann","email": "ann@example.com","phone": "555"}])
+        app.db.session.execute(insert(app.Product),[{"product_id": 1,"name": "widget","price": 2.5,"stock_level": stock_level}])
+        app.db.session.commit()
+
+def stock(client):
+    return client.get("/products/1/available").json
+
+def test_any_request_starts_the_reservation_sweep(app,client):
+    client.get("/")
+    assert "reservation-sweep" in app.background_jobs
+
+# stock_level was set below the held quantity after the hold was made: confirming must not take
+# stock_level negative, the hold stays held and can still be released
+def test_confirm_refuses_when_stock_dropped_below_the_hold(app,client):
+    seed_product(app,10)
+    response = client.post("/reservations",json={"customer_id": 1,"products": [{"product_id": 1,"quantity": 5}]})
+    assert response.status_code == 201
+    reservation_id = response.json["reservation_id"]
+
+    response = client.put("/products/1",json={"name": "widget","price": 2.5,"stock_level": 2})
+    assert response.status_code == 200
+
+    response = client.post(f"/reservations/{reservation_id}/confirm")
+    assert response.status_code == 409
+    assert stock(client) == {"product_id": 1,"stock_level": 2,"reserved_stock": 5,"available": -3}
+
+    assert client.delete(f"/reservations/{reservation_id}").status_code == 200
+    assert stock(client) == {"product_id": 1,"stock_level": 2,"reserved_stock": 0,"available": 2}
+
+def test_confirm_sells_the_held_units(app,client):
+    seed_product(app,10)
+    reservation_id = client.post("/reservations",json={"customer_id": 1,"products": [{"product_id": 1,"quantity": 4}]}).json["reservation_id"]
+    response = client.post(f"/reservations/{reservation_id}/confirm")
+    assert response.status_code == 201
+    assert stock(client) == {"product_id": 1,"stock_level": 6,"reserved_stock": 0,"available": 6}
@@ -0,0 +1,96 @@
+import datetime
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+def seed(app,*products):
+    with app.app.app_context():
+        app.db.session.execute(insert(app.Customer),[{"customer_id": 1,"name": "Ann","email": "ann@example.com","phone": "555"}])
+        app.db.session.execute(insert(app.Product),[
+            {"product_id": product_id,"name": f"product {product_id}","price": 2.5,"stock_level": stock_level}
+            for product_id,stock_level in products
+        ])
+        app.db.session.commit()
+
+def order(client,product_id,quantity):
+    return client.post("/orders",json={"date": "2024-01-01","customer_id": 1,"products": [{"product_id": product_id,"quantity": quantity}]})
+
+def jobs(app):
+    with app.app.app_context():
+        return {job.product_id: job.status for job in app.db.session.execute(select(app.RestockJob)).scalars()}
+
+def stock_level(app,product_id):
+    with app.app.app_context():
+        return app.db.session.get(app.Product,product_id).stock_level
+
+def test_order_that_leaves_a_product_low_queues_one_job(app,client):
+    seed(app,(1,20),(2,50))
+    assert order(client,1,12).status_code == 201 # 8 left, below the threshold of 10
+    assert order(client,2,5).status_code == 201
+    assert order(client,1,1).status_code == 201 # still low, the existing job covers it
+    assert jobs(app) == {1: "pending"}
+    assert client.get("/products/restock/jobs").json == {"pending": 1,"claimed": 0}
+
+# the job is written in the order's transaction: if it can't be written the order isn't either,
+# so the client never gets a 500 for an order that went through
+def test_failed_job_insert_rolls_back_the_order(app,client,monkeypatch):
+    seed(app,(1,5))
+
+    def fail(session,product_ids):
+        raise RuntimeError("lock wait timeout")
+    monkeypatch.setattr(app,"emit_restock_jobs",fail)
+
+    assert order(client,1,1).status_code == 500
+    assert stock_level(app,1) == 5
+    with app.app.app_context():
+        assert app.db.session.query(app.Order).count() == 0
+
+def test_claimed_jobs_are_not_claimed_twice(app,client):
+    seed(app,(1,5),(2,5))
+    order(client,1,1)
+    order(client,2,1)
+
+    with app.app.app_context():
+        with Session(app.db.engine) as session:
+            with session.begin():
+                first = app.claim_restock_jobs(session,1)
+        with Session(app.db.engine) as session:
+            with session.begin():
+                second = app.claim_restock_jobs(session,10)
+        with Session(app.db.engine) as session:
+            with session.begin():
+                third = app.claim_restock_jobs(session,10)
+
+    assert len(first) == 1
+    assert sorted(first + second) == [1,2]
+    assert third == []
+    assert jobs(app) == {1: "claimed",2: "claimed"}
+
+# a worker that died after claiming: its jobs are picked up again once the claim is old enough
+def test_stale_claims_are_picked_up_again(app,client):
+    seed(app,(1,5),(2,5))
+    order(client,1,1)
+    order(client,2,1)
+    with app.app.app_context():
+        with Session(app.db.engine) as session:
+            with session.begin():
+                assert sorted(app.claim_restock_jobs(session,10)) == [1,2]
+            with session.begin():
+                stale = app.utcnow() - datetime.timedelta(seconds=app.RESTOCK_CLAIM_TIMEOUT + 1)
+                session.execute(update(app.RestockJob).where(app.RestockJob.product_id == 1).values(claimed_at=stale))
+        with Session(app.db.engine) as session:
+            with session.begin():
+                assert app.claim_restock_jobs(session,10) == [1]
+
+def test_worker_restocks_low_products_and_clears_the_queue(app,client):
+    seed(app,(1,5),(2,5))
+    order(client,1,1)
+    order(client,2,1)
+    # restocked by hand before the worker got to it, the worker leaves it alone
+    assert client.post("/products/restock",json={"products": [{"product_id": 2,"quantity": 30}]}).status_code == 200
+
+    with app.app.app_context():
+        assert app.run_restock_batch() == (2,1)
+    assert stock_level(app,1) == app.RESTOCK_TARGET_LEVEL
+    assert stock_level(app,2) == 34
+    assert jobs(app) == {}
@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert
+
+STOCK = 100
+ORDERS = 300
+THREADS = 15
+
+# 300 one unit orders race for 100 units: exactly 100 may succeed and stock must end at 0, never below
+def test_concurrent_orders_never_oversell(app):
+    with app.app.app_context():
+        session = app.db.session
+        session.execute(insert(app.Customer),[{"customer_id": 1,"name": "Ann","email": "ann@example.com","phone": "555"}])
+        session.execute(insert(app.Product),[{"product_id": 1,"name": "widget","price": 2.5,"stock_level": STOCK}])
+        session.commit()
+
+    order = {"date": "2024-01-01","customer_id": 1,"products": [{"product_id": 1,"quantity": 1}]}
+
+    def place_order(_):
+        # one test client per request, a client is not meant to be shared between threads
+        return app.app.test_client().post("/orders",json=order).status_code
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        statuses = list(pool.map(place_order,range(ORDERS)))
+
+    assert statuses.count(201) == STOCK
+    # the rest are turned away as out of stock (404), none may fail with a database error
+    assert statuses.count(404) == ORDERS - STOCK
+    with app.app.app_context():
+        assert app.db.session.get(app.Product,1).stock_level == 0
+        assert app.db.session.query(app.Order).count() == STOCK
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+def customers_version(app):
+    with app.app.app_context():
+        return app.table_version("Customers")
+
+def customer_count(app):
+    with app.app.app_context():
+        return app.db.session.execute(select(func.count()).select_from(app.Customer)).scalar()
+
+def test_write_moves_the_etag(app,client):
+    first = client.get("/customers?limit=10")
+    assert client.post("/customers",json={"name": "Ann","email": "ann@example.com","phone": "1"}).status_code == 200
+
+    second = client.get("/customers?limit=10",headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+def test_rolled_back_write_bumps_nothing(app):
+    before = customers_version(app)
+    with app.app.app_context():
+        with Session(app.db.engine) as session:
+            session.add(app.Customer(name="Ann",email="ann@example.com",phone="1"))
+            app.bump_table_version(session,"Customers")
+            session.rollback()
+            session.commit() # nothing left to commit, and nothing left to bump
+    assert customers_version(app) == before
+
+# the bump runs on the writer's own connection, so a write still goes through when the pool
+# has nothing else to hand out
+def test_bump_needs_no_second_connection(app):
+    before = customers_version(app)
+    with app.app.app_context():
+        url = app.db.engine.url
+    engine = create_engine(url,poolclass=QueuePool,pool_size=1,max_overflow=0,pool_timeout=1)
+    try:
+        start = time.perf_counter()
+        with Session(engine) as session:
+            with session.begin():
+                session.add(app.Customer(name="Ann",email="ann@example.com",phone="1"))
+                app.bump_table_version(session,"Customers")
+        assert time.perf_counter() - start < 1
+    finally:
+        engine.dispose()
+    assert customers_version(app) == before + 1
+
+# a committed write with an old version would keep answering 304 to clients holding stale data
+def test_failed_bump_fails_the_write(app):
+    before = customers_version(app)
+    with app.app.app_context():
+        url = app.db.engine.url
+    engine = create_engine(url)
+
+    @event.listens_for(engine,"before_cursor_execute")
+    def fail_version_update(conn,cursor,statement,parameters,context,executemany):
+        if statement.startswith("UPDATE") and "Table_Versions" in statement:
+            raise RuntimeError("lock wait timeout")
+
+    try:
+        with pytest.raises(RuntimeError):
+            with Session(engine) as session:
+                with session.begin():
+                    session.add(app.Customer(name="Ann",email="ann@example.com",phone="1"))
+                    app.bump_table_version(session,"Customers")
+    finally:
+        engine.dispose()
+    assert customers_version(app) == before
+    assert customer_count(app) == 0